@@ -0,0 +1,41 @@
+"""Gunicorn configuration for serving the classifier with several worker processes.
+
+The model is loaded once in the master process before the workers are forked, so all workers
+share the same weights instead of loading a copy each. Run it from the src directory:
+
+    gunicorn -c ../gunicorn.conf.py classifier_demo.main:app
+"""
+
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+# Split the cores between the workers so their forward passes do not oversubscribe the CPU
+_worker_torch_threads = int(os.environ.get("TORCH_THREADS", max((os.cpu_count() or 2) // 2 // workers, 1)))
+
+# The master only loads the model. An OpenMP thread pool started before the fork cannot be used
+# in the forked workers, so the app is imported with a single thread and workers size their pool in post_fork
+os.environ["TORCH_THREADS"] = "1"
+
+
+def on_starting(server):  # noqa: ARG001
+    """Load the model in the master process before any worker is forked."""
+    import torch
+
+    from classifier_demo.services.content_moderation_service import preload_model
+
+    # CUDA contexts do not survive fork, GPU workers load the model themselves
+    if os.environ.get("MODEL_BACKEND", "torch") != "torch" or torch.cuda.is_available():
+        return
+    preload_model()
+
+
+def post_fork(server, worker):  # noqa: ARG001
+    """Give each forked worker its share of the torch threads."""
+    import torch
+
+    os.environ["TORCH_THREADS"] = str(_worker_torch_threads)
+    torch.set_num_threads(_worker_torch_threads)
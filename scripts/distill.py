@@ -0,0 +1,135 @@
+"""Distill the content moderation model into a smaller student model.
+
+The teacher scores an unlabeled corpus, and a small transformer is trained to reproduce the
+teacher's per-category probabilities. The resulting checkpoint can be served by pointing the
+service at it:
+
+    python scripts/distill.py --corpus texts.txt --output-dir models/moderation-minilm
+    MODEL_NAME=models/moderation-minilm make run
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import List
+
+import torch
+import torch.nn.functional as F  # noqa: N812
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, get_linear_schedule_with_warmup
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, required=True, help="Text file with one unlabeled text per line.")
+    parser.add_argument("--output-dir", type=Path, required=True, help="Directory to save the student checkpoint to.")
+    parser.add_argument("--teacher", default="KoalaAI/Text-Moderation", help="Teacher model name or path.")
+    parser.add_argument("--student", default="nreimers/MiniLM-L6-H384-uncased", help="Student model name or path.")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=5e-5)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--temperature", type=float, default=2.0, help="Softens teacher and student logits.")
+    return parser.parse_args()
+
+
+def load_corpus(path: Path) -> List[str]:
+    """Read the non-empty lines of the corpus file."""
+    with path.open(encoding="utf-8") as corpus:
+        return [line.strip() for line in corpus if line.strip()]
+
+
+def teacher_logits(model_name: str, texts: List[str], batch_size: int, max_length: int, device: str) -> torch.Tensor:
+    """Score the corpus with the teacher model.
+
+    Returns:
+        torch.Tensor: The teacher logits of shape [len(texts), num_labels], on the CPU.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).to(device).eval()
+
+    batches = []
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            inputs = tokenizer(
+                texts[start : start + batch_size],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+            ).to(device)
+            batches.append(model(**inputs).logits.float().cpu())
+            logger.info("Teacher scored %d/%d texts", min(start + batch_size, len(texts)), len(texts))
+    return torch.cat(batches)
+
+
+def main() -> None:
+    """Run the distillation."""
+    args = parse_args()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    texts = load_corpus(args.corpus)
+    if not texts:
+        raise SystemExit(f"Corpus {args.corpus} contains no texts to distill on.")
+    logger.info("Loaded %d texts from %s", len(texts), args.corpus)
+    targets = teacher_logits(args.teacher, texts, args.batch_size, args.max_length, device)
+
+    # The student predicts the same categories as the teacher
+    teacher_config = AutoConfig.from_pretrained(args.teacher)
+    tokenizer = AutoTokenizer.from_pretrained(args.student)
+    student = AutoModelForSequenceClassification.from_pretrained(
+        args.student,
+        num_labels=teacher_config.num_labels,
+        id2label=teacher_config.id2label,
+        label2id=teacher_config.label2id,
+    ).to(device)
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.learning_rate)
+    steps_per_epoch = (len(texts) + args.batch_size - 1) // args.batch_size
+    scheduler = get_linear_schedule_with_warmup(
+        optimizer,
+        num_warmup_steps=steps_per_epoch // 10,
+        num_training_steps=steps_per_epoch * args.epochs,
+    )
+
+    student.train()
+    for epoch in range(args.epochs):
+        permutation = torch.randperm(len(texts))
+        total_loss = 0.0
+        for start in range(0, len(texts), args.batch_size):
+            indices = permutation[start : start + args.batch_size]
+            inputs = tokenizer(
+                [texts[i] for i in indices],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=args.max_length,
+            ).to(device)
+
+            # The service scores categories independently with a sigmoid, so match the teacher's
+            # per-category probabilities; this is the binary KL divergence up to a constant
+            soft_targets = torch.sigmoid(targets[indices].to(device) / args.temperature)
+            student_logits = student(**inputs).logits / args.temperature
+            loss = F.binary_cross_entropy_with_logits(student_logits, soft_targets) * args.temperature**2
+
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad()
+            total_loss += loss.item()
+
+        logger.info("Epoch %d/%d - distillation loss: %.4f", epoch + 1, args.epochs, total_loss / steps_per_epoch)
+
+    student.save_pretrained(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
+    logger.info("Saved student model to %s", args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
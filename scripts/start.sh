@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+# Start the classifier service with CPU threading tuned for model inference.
+#
+# A single uvicorn worker owns the model and uses all cores for each forward pass;
+# running several workers would make them compete for the same cores.
+set -euo pipefail
+
+NUM_CORES=$(( $(nproc) / 2 ))
+NUM_CORES=$(( NUM_CORES > 0 ? NUM_CORES : 1 ))
+
+# Pin OpenMP threads to cores so they do not migrate between them
+export OMP_NUM_THREADS="${OMP_NUM_THREADS:-${NUM_CORES}}"
+export TORCH_THREADS="${TORCH_THREADS:-${OMP_NUM_THREADS}}"
+export KMP_AFFINITY="${KMP_AFFINITY:-granularity=fine,compact,1,0}"
+export KMP_BLOCKTIME="${KMP_BLOCKTIME:-1}"
+
+cd "$(dirname "$0")/../src"
+exec uvicorn classifier_demo.main:app --host "${HOST:-0.0.0.0}" --port "${PORT:-8000}" --workers 1 "$@"
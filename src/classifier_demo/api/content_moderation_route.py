@@ -4,14 +4,13 @@ This module provides FastAPI routes for content moderation functionality,
 allowing text content to be analyzed and scored across different categories.
 """
 
-from typing import Annotated, Dict
+from typing import Dict
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
-from classifier_demo.services.content_moderation_service import (
-    ContentModerationService,
-)
+from classifier_demo.services.request_batcher import RequestBatcher
 
 # Initialize router with prefix and tags for API documentation
 router = APIRouter(
@@ -20,15 +19,6 @@ router = APIRouter(
 )
 
 
-def get_moderation_service() -> ContentModerationService:
-    """Get an instance of the content moderation service.
-
-    Returns:
-        ContentModerationService: A configured instance of the moderation service.
-    """
-    return ContentModerationService()
-
-
 class ModerationRequest(BaseModel):
     """Request model for content moderation.
 
@@ -49,19 +39,21 @@ class ModerationResponse(BaseModel):
     scores: Dict[str, float]
 
 
-@router.post("/moderate", response_model=ModerationResponse)
+# The response model only documents the endpoint; scores are serialized by orjson without re-validation
+@router.post("/moderate", response_model=ModerationResponse, response_class=ORJSONResponse)
 async def moderate_content(
     moderation_request: ModerationRequest,
-    service: Annotated[ContentModerationService, Depends(get_moderation_service)],
-) -> ModerationResponse:
+    request: Request,
+) -> ORJSONResponse:
     """Moderate the provided text content and return category scores.
 
     Args:
         moderation_request: The request containing the text to moderate.
-        service: The content moderation service instance.
+        request: The incoming HTTP request, used to reach the batcher started by the application lifespan.
 
     Returns:
-        ModerationResponse: The moderation scores for different categories.
+        ORJSONResponse: The moderation scores for different categories, shaped like ModerationResponse.
     """
-    scores = service.moderate_text(moderation_request.text)
-    return ModerationResponse(scores=scores)
+    batcher: RequestBatcher = request.app.state.batcher
+    scores = await batcher.submit(moderation_request.text)
+    return ORJSONResponse({"scores": scores})
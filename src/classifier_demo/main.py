@@ -1,34 +1,65 @@
 """FastAPI application for Heroes and Movies API."""
 
+import contextlib
+import os
 from contextlib import asynccontextmanager
 
+import torch
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from classifier_demo.api import content_moderation_route
 from classifier_demo.middleware.rps_tracker import RPSTrackerMiddleware
 from classifier_demo.services.content_moderation_service import (
     ContentModerationService,
 )
+from classifier_demo.services.request_batcher import RequestBatcher
 
 app = FastAPI(title="Heroes and Movies API")
 
 
+def configure_torch_threads() -> None:
+    """Size the torch thread pools for a single model serving requests one batch at a time."""
+    # Intra-op threads run the matmuls of a forward pass; default to the physical cores
+    num_threads = int(os.environ.get("TORCH_THREADS", max((os.cpu_count() or 2) // 2, 1)))
+    torch.set_num_threads(num_threads)
+
+    # Batches run one at a time, so a larger inter-op pool only oversubscribes the cores.
+    # The inter-op pool can only be sized before it is first used
+    with contextlib.suppress(RuntimeError):
+        torch.set_num_interop_threads(1)
+
+
+configure_torch_threads()
+
+
 @asynccontextmanager
-async def lifespan(_: FastAPI):
+async def lifespan(app: FastAPI):
     """Lifespan context manager for FastAPI."""
     # Initialize content moderation service and download model
     print("Initializing content moderation service and downloading model...")
     content_moderation = ContentModerationService.initialize()
+    app.state.moderation = content_moderation
     print("Content moderation service initialized successfully!")
 
+    # Start the worker that batches concurrent moderation requests
+    app.state.batcher = RequestBatcher(content_moderation)
+    app.state.batcher.start()
+
     yield
 
+    await app.state.batcher.stop()
     content_moderation.cleanup()
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
-    app = FastAPI(title="Classifier service API", version="1.0.0", lifespan=lifespan)
+    app = FastAPI(
+        title="Classifier service API",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
 
     # Add RPS tracker middleware
     app.add_middleware(RPSTrackerMiddleware)
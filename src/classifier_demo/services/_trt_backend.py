@@ -0,0 +1,164 @@
+"""TensorRT backend for the content moderation model.
+
+The model is exported to ONNX and compiled into an FP16 TensorRT engine the first time it is used.
+The serialized engine is cached on disk so later processes only need to deserialize it.
+"""
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+from threading import Lock
+
+import tensorrt as trt
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, PretrainedConfig
+
+logger = logging.getLogger(__name__)
+
+# Names of the engine inputs and output, shared by the ONNX export and the runtime bindings
+INPUT_NAMES = ("input_ids", "attention_mask")
+OUTPUT_NAME = "logits"
+
+# Shapes of the optimization profile: the engine accepts up to MAX_BATCH_SIZE texts of MAX_LENGTH tokens
+# and its kernels are tuned for OPT_BATCH_SIZE texts of OPT_LENGTH tokens
+MAX_BATCH_SIZE = 32
+MAX_LENGTH = 512
+OPT_BATCH_SIZE = 8
+OPT_LENGTH = 128
+
+_trt_logger = trt.Logger(trt.Logger.WARNING)
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wraps a sequence classification model so the exported graph has a single logits output."""
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def _export_onnx(model_name: str, onnx_path: Path) -> None:
+    """Export the model to ONNX with dynamic batch and sequence axes."""
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    example = torch.ones((1, OPT_LENGTH), dtype=torch.long)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES}
+    dynamic_axes[OUTPUT_NAME] = {0: "batch"}
+
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (example, example),
+            str(onnx_path),
+            input_names=list(INPUT_NAMES),
+            output_names=[OUTPUT_NAME],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+
+
+def _build_engine(onnx_path: Path, plan_path: Path) -> None:
+    """Compile the ONNX graph into a serialized FP16 TensorRT engine."""
+    builder = trt.Builder(_trt_logger)
+    network = builder.create_network(0)
+    parser = trt.OnnxParser(network, _trt_logger)
+    if not parser.parse_from_file(str(onnx_path)):
+        errors = "; ".join(str(parser.get_error(i)) for i in range(parser.num_errors))
+        raise RuntimeError(f"Failed to parse ONNX model {onnx_path}: {errors}")
+
+    config = builder.create_builder_config()
+    config.set_flag(trt.BuilderFlag.FP16)
+
+    profile = builder.create_optimization_profile()
+    for name in INPUT_NAMES:
+        profile.set_shape(name, (1, 1), (OPT_BATCH_SIZE, OPT_LENGTH), (MAX_BATCH_SIZE, MAX_LENGTH))
+    config.add_optimization_profile(profile)
+
+    engine_bytes = builder.build_serialized_network(network, config)
+    if engine_bytes is None:
+        raise RuntimeError(f"Failed to build TensorRT engine from {onnx_path}")
+    plan_path.write_bytes(engine_bytes)
+
+
+def _build_plan(model_name: str, plan_path: Path) -> None:
+    """Export the model and build its engine, then move the engine to ``plan_path`` in one step.
+
+    The engine is built in a private directory, so processes starting at the same time never read a
+    partially written engine.
+    """
+    plan_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=plan_path.parent) as build_dir:
+        onnx_path = Path(build_dir) / "model.onnx"
+        _export_onnx(model_name, onnx_path)
+        _build_engine(onnx_path, Path(build_dir) / "model.plan")
+        os.replace(Path(build_dir) / "model.plan", plan_path)
+
+
+class TensorRTModel:
+    """Runs the classification model through a cached TensorRT engine."""
+
+    def __init__(self, model_name: str, cache_dir: Path) -> None:
+        """Load the TensorRT engine, exporting and building it on first use.
+
+        Args:
+            model_name: The name or path of the pre-trained model.
+            cache_dir: The directory where engines are cached, one per TensorRT version and GPU architecture.
+
+        Raises:
+            RuntimeError: If the cached engine cannot be deserialized.
+        """
+        self.config: PretrainedConfig = AutoConfig.from_pretrained(model_name)
+
+        # Serialized engines only load with the TensorRT version and GPU architecture they were built for
+        major, minor = torch.cuda.get_device_capability()
+        plan_path = cache_dir / f"trt-{trt.__version__}-sm{major}{minor}" / "model.plan"
+        if not plan_path.exists():
+            logger.info("Building TensorRT engine for %s in %s", model_name, plan_path.parent)
+            _build_plan(model_name, plan_path)
+
+        runtime = trt.Runtime(_trt_logger)
+        self.engine = runtime.deserialize_cuda_engine(plan_path.read_bytes())
+        if self.engine is None:
+            raise RuntimeError(f"Failed to deserialize TensorRT engine {plan_path}, delete it to rebuild the engine")
+        self.context = self.engine.create_execution_context()
+
+        # The execution context holds the bound shapes and addresses, so calls must not interleave
+        self._lock = Lock()
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """Run the engine on a batch of CUDA input tensors.
+
+        Batches larger than MAX_BATCH_SIZE are run in chunks, since the engine is built for at most that many texts.
+
+        Args:
+            input_ids: Token ids of shape [batch_size, sequence_length].
+            attention_mask: Attention mask of shape [batch_size, sequence_length].
+
+        Returns:
+            torch.Tensor: The logits of shape [batch_size, num_labels], on the GPU.
+        """
+        if input_ids.shape[0] > MAX_BATCH_SIZE:
+            chunks = zip(input_ids.split(MAX_BATCH_SIZE), attention_mask.split(MAX_BATCH_SIZE))
+            return torch.cat([self(chunk_ids, chunk_mask) for chunk_ids, chunk_mask in chunks])
+
+        inputs = {"input_ids": input_ids.contiguous(), "attention_mask": attention_mask.contiguous()}
+        logits = torch.empty((input_ids.shape[0], self.config.num_labels), dtype=torch.float32, device="cuda")
+        stream = torch.cuda.current_stream()
+
+        with self._lock:
+            for name, tensor in inputs.items():
+                self.context.set_input_shape(name, tuple(tensor.shape))
+                self.context.set_tensor_address(name, tensor.data_ptr())
+            self.context.set_tensor_address(OUTPUT_NAME, logits.data_ptr())
+
+            if not self.context.execute_async_v3(stream.cuda_stream):
+                raise RuntimeError("TensorRT engine execution failed")
+            stream.synchronize()
+
+        return logits
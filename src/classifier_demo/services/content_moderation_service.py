@@ -1,18 +1,24 @@
 """Content Moderation Service.
 
 This service provides content moderation capabilities using a pre-trained transformer model.
-It implements a singleton pattern to ensure efficient resource usage and includes rate limiting
-functionality to track request rates.
+Models are loaded once per process and shared by all service instances, and the service
+includes rate limiting functionality to track request rates.
 """
 
+import array
+import functools
 import logging
+import os
 import time
-from collections import deque
+from collections import OrderedDict
+from pathlib import Path
 from threading import Lock
-from typing import Deque, Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 import torch
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from classifier_demo.services.moderation_model import ModerationModel
+from classifier_demo.services.prefilter import UnsafeTextPrefilter
 
 # Configure logging
 logging.basicConfig(
@@ -21,17 +27,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Model used when none is given explicitly, e.g. a student checkpoint produced by scripts/distill.py
+DEFAULT_MODEL_NAME = os.environ.get("MODEL_NAME", "KoalaAI/Text-Moderation")
+
+# Serializes model loading so concurrent callers never load the same model twice
+_load_lock = Lock()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_model(model_name: str) -> ModerationModel:
+    """Load a moderation model, reusing it for every later call with the same name.
+
+    Args:
+        model_name: The name or path of the pre-trained model to use.
+
+    Returns:
+        ModerationModel: The loaded model.
+    """
+    return ModerationModel(model_name)
+
+
+def preload_model(model_name: str = DEFAULT_MODEL_NAME) -> ModerationModel:
+    """Load a model in a pre-fork server process so that forked workers share its weights.
+
+    Workers forked afterwards find the model in the loader cache and read its weights from pages
+    shared with the parent instead of loading their own copy. The calling process is limited to a
+    single torch thread: an OpenMP thread pool started before the fork is unusable in the children,
+    so workers size their own pool after they are forked.
+
+    Args:
+        model_name: The name or path of the pre-trained model to use.
+
+    Returns:
+        ModerationModel: The loaded model.
+    """
+    torch.set_num_threads(1)
+    with _load_lock:
+        model = _load_model(model_name)
+    model.share_memory()
+    return model
+
 
 class ContentModerationService:
     """Service for content moderation using a pre-trained transformer model.
 
-    This class implements a singleton pattern to ensure only one instance of the model
-    is loaded in memory. It provides methods for text moderation and request rate tracking.
+    All instances created for the same model name share a single loaded model, so only one copy
+    of it is kept in memory. It provides methods for text moderation and request rate tracking.
     """
 
-    _instance: Optional["ContentModerationService"] = None
-    _initialized: bool = False
-
     # Mapping of model labels to human-readable categories
     CATEGORY_MAPPING: Dict[str, str] = {  # noqa: RUF012
         "H": "Hate Speech",
@@ -45,39 +88,46 @@ class ContentModerationService:
         "V2": "Violence (Severe)",
     }
 
-    def __new__(cls, *args, **kwargs) -> "ContentModerationService":  # noqa: ARG004
-        """Create or return the singleton instance of ContentModerationService.
+    # Length of the request rate window in seconds, tracked as one bucket per second
+    RATE_WINDOW_SECONDS: int = 60
 
-        Returns:
-            ContentModerationService: The singleton instance.
-        """
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    # Number of recent texts whose scores are cached, and the longest text that gets cached
+    SCORE_CACHE_SIZE: int = 4096
+    SCORE_CACHE_MAX_TEXT_LENGTH: int = 1024
 
-    def __init__(self, model_name: str = "KoalaAI/Text-Moderation") -> None:
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME) -> None:
         """Initialize the content moderation service.
 
         Args:
             model_name: The name or path of the pre-trained model to use.
         """
-        if not self._initialized:
-            self.model_name = model_name
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
-            self.model.eval()  # Set to evaluation mode
-
-            # Initialize request tracking
-            self.request_timestamps: Deque[float] = deque(maxlen=1000)  # Store last 1000 requests
-            self.request_lock = Lock()
-            self._initialized = True
-            logger.info(
-                "ContentModerationService initialized with model: %s",
-                model_name,
-            )
+        self.model_name = model_name
+        with _load_lock:
+            self.model = _load_model(model_name)
+
+        # Human-readable category names, indexed by class id
+        id2label = self.model.config.id2label
+        self._labels = [self.CATEGORY_MAPPING.get(id2label[i], id2label[i]) for i in range(len(id2label))]
+
+        # Optionally answer short texts without unsafe patterns as safe content, skipping the model
+        self._prefilter = self._create_prefilter()
+        self._safe_scores = tuple(1.0 if id2label[i] == "OK" else 0.0 for i in range(len(id2label)))
+
+        # Initialize request tracking: a ring of per-second request counts and the second each one belongs to
+        self._request_counts = array.array("l", [0] * self.RATE_WINDOW_SECONDS)
+        self._request_seconds = array.array("l", [0] * self.RATE_WINDOW_SECONDS)
+        self.request_lock = Lock()
+
+        # Initialize the LRU cache of scores for repeated texts
+        self._score_cache: OrderedDict[str, Tuple[float, ...]] = OrderedDict()
+        self._score_cache_lock = Lock()
+        logger.info(
+            "ContentModerationService initialized with model: %s",
+            model_name,
+        )
 
     @classmethod
-    def initialize(cls, model_name: str = "KoalaAI/Text-Moderation") -> "ContentModerationService":
+    def initialize(cls, model_name: str = DEFAULT_MODEL_NAME) -> "ContentModerationService":
         """Initialize the service and download the model.
 
         Args:
@@ -94,21 +144,34 @@ class ContentModerationService:
         Returns:
             float: The number of requests per second in the last minute.
         """
-        current_time = time.time()
-        one_minute_ago = current_time - 60
+        now = int(time.time())
+        window_start = now - self.RATE_WINDOW_SECONDS
 
-        with self.request_lock:
-            # Remove requests older than one minute
-            while self.request_timestamps and self.request_timestamps[0] < one_minute_ago:
-                self.request_timestamps.popleft()
+        # Sum the buckets that still belong to the window
+        total_requests = sum(
+            count for count, second in zip(self._request_counts, self._request_seconds) if second > window_start
+        )
+        if not total_requests:
+            return 0.0
 
-            # Calculate rate
-            if not self.request_timestamps:
-                return 0.0
+        requests_per_second = total_requests / float(self.RATE_WINDOW_SECONDS)
+        logger.info("Current request rate: %.2f requests/second", requests_per_second)
+        return requests_per_second
 
-            requests_per_second = len(self.request_timestamps) / 60.0
-            logger.info("Current request rate: %.2f requests/second", requests_per_second)
-            return requests_per_second
+    def _record_requests(self, count: int) -> None:
+        """Add requests to the bucket of the current second.
+
+        Args:
+            count: The number of requests to record.
+        """
+        now = int(time.time())
+        slot = now % self.RATE_WINDOW_SECONDS
+        with self.request_lock:
+            # Reset a bucket left over from a previous pass around the ring
+            if self._request_seconds[slot] != now:
+                self._request_seconds[slot] = now
+                self._request_counts[slot] = 0
+            self._request_counts[slot] += count
 
     def moderate_text(self, text: str) -> Dict[str, float]:
         """Process text through the moderation model and return category scores.
@@ -119,32 +182,96 @@ class ContentModerationService:
         Returns:
             Dict[str, float]: A dictionary mapping category names to their confidence scores.
         """
-        # Track request timestamp
-        with self.request_lock:
-            self.request_timestamps.append(time.time())
+        return self.moderate_batch([text])[0]
 
-        # Tokenize and prepare input
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+    def moderate_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Process a batch of texts through the moderation model in a single forward pass.
+
+        Args:
+            texts: The texts to be moderated.
+
+        Returns:
+            List[Dict[str, float]]: Category scores for each text, in the same order as the input.
+        """
+        # Track request rate
+        self._record_requests(len(texts))
 
-        # Run inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            confidence_scores = torch.sigmoid(outputs.logits).squeeze().numpy()
+        # Serve repeated texts from the cache and run the model only on the rest
+        texts = [text.strip() for text in texts]
+        scores: Dict[str, Tuple[float, ...]] = {}
+        for text in texts:
+            if self._prefilter is not None and self._prefilter.is_trivially_safe(text):
+                scores[text] = self._safe_scores
+                continue
+            cached = self._get_cached_scores(text)
+            if cached is not None:
+                scores[text] = cached
 
-        # Get category labels and map them to human-readable categories
-        category_labels = self.model.config.id2label
+        uncached_texts = [text for text in dict.fromkeys(texts) if text not in scores]
+        if uncached_texts:
+            # Tokenize and run inference
+            confidence_scores = self.model.forward(self.model.tokenize(uncached_texts))
+            for text, row in zip(uncached_texts, confidence_scores.tolist()):
+                scores[text] = tuple(row)
+                self._cache_scores(text, scores[text])
+
+        # Create result dictionaries with human-readable categories
+        return [dict(zip(self._labels, scores[text])) for text in texts]
+
+    def _create_prefilter(self) -> Optional[UnsafeTextPrefilter]:
+        """Create the unsafe text prefilter if it is enabled with MODERATION_PREFILTER=1.
+
+        Patterns are read from the file in MODERATION_PREFILTER_PATTERNS, if set.
+
+        Returns:
+            Optional[UnsafeTextPrefilter]: The prefilter, or None if it is disabled.
+        """
+        if os.environ.get("MODERATION_PREFILTER", "0") != "1":
+            return None
+        if "OK" not in self.model.config.id2label.values():
+            logger.warning("Model %s has no safe content label, the prefilter is disabled.", self.model_name)
+            return None
 
-        # Create result dictionary with mapped categories
-        return {
-            self.CATEGORY_MAPPING.get(category_labels[i], category_labels[i]): float(score)
-            for i, score in enumerate(confidence_scores)
-        }
+        patterns_path = os.environ.get("MODERATION_PREFILTER_PATTERNS")
+        if patterns_path:
+            return UnsafeTextPrefilter.from_file(Path(patterns_path))
+        return UnsafeTextPrefilter()
+
+    def _get_cached_scores(self, text: str) -> Optional[Tuple[float, ...]]:
+        """Look up the cached scores of a text and mark them as recently used.
+
+        Args:
+            text: The normalized text.
+
+        Returns:
+            Optional[Tuple[float, ...]]: The scores indexed by class id, or None on a cache miss.
+        """
+        with self._score_cache_lock:
+            scores = self._score_cache.get(text)
+            if scores is not None:
+                self._score_cache.move_to_end(text)
+            return scores
+
+    def _cache_scores(self, text: str, scores: Tuple[float, ...]) -> None:
+        """Store the scores of a text, evicting the least recently used entry when full.
+
+        Args:
+            text: The normalized text.
+            scores: The scores indexed by class id.
+        """
+        if len(text) > self.SCORE_CACHE_MAX_TEXT_LENGTH:
+            return
+        with self._score_cache_lock:
+            self._score_cache[text] = scores
+            self._score_cache.move_to_end(text)
+            if len(self._score_cache) > self.SCORE_CACHE_SIZE:
+                self._score_cache.popitem(last=False)
 
     def cleanup(self) -> None:
-        """Clean up service resources and reset the singleton instance."""
-        if self._initialized:
-            logger.info("Cleaning up ContentModerationService resources.")
-            self._initialized = False
-            self._instance = None
-        else:
-            logger.warning("ContentModerationService is not initialized.")
+        """Clean up service resources.
+
+        The loaded model stays cached for the process so a new service does not load it again.
+        """
+        logger.info("Cleaning up ContentModerationService resources.")
+        with self._score_cache_lock:
+            self._score_cache.clear()
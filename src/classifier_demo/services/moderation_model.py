@@ -0,0 +1,365 @@
+"""Moderation Model.
+
+This module loads the transformer model behind the content moderation service and runs it on
+batches of texts. Depending on the configuration the model is served by PyTorch (optionally
+quantized, traced or moved to a CUDA GPU), ONNX Runtime or TensorRT.
+"""
+
+import importlib.metadata
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+# Directory for model artifacts exported at startup, such as ONNX graphs and TensorRT engines
+CACHE_DIR = Path(os.environ.get("CLASSIFIER_DEMO_CACHE_DIR", Path.home() / ".cache" / "classifier_demo"))
+
+
+@contextmanager
+def _build_directory(target: Path) -> Iterator[Path]:
+    """Yield a private directory to build a cached artifact in, then move it to ``target`` in one step.
+
+    Processes starting at the same time each build their own copy, and readers never see a partially
+    written directory. The first copy to finish is kept and the others are discarded.
+
+    Args:
+        target: The directory the artifact is cached in.
+
+    Yields:
+        Path: The directory to write the artifact to.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    build_dir = Path(tempfile.mkdtemp(prefix=f".{target.name}-", dir=target.parent))
+    try:
+        yield build_dir
+        try:
+            os.replace(build_dir, target)
+        except OSError:
+            # Another process has already cached the artifact
+            if not target.exists():
+                raise
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+class ModerationModel:
+    """A tokenizer and sequence classification model, prepared for fast inference.
+
+    The backend and precision are selected with the MODEL_BACKEND, MODEL_QUANT,
+    MODEL_ATTN_IMPLEMENTATION and MODEL_TORCHSCRIPT environment variables.
+    """
+
+    # Maximum number of tokens fed to the model per text
+    MAX_LENGTH: int = 512
+
+    # Sequence lengths that traced models are specialized for; batches are padded up to the nearest one
+    SEQUENCE_BUCKETS: Tuple[int, ...] = (32, 64, 128, 256, 512)
+
+    def __init__(self, model_name: str) -> None:
+        """Load the model and prepare it for inference.
+
+        Args:
+            model_name: The name or path of the pre-trained model to use.
+        """
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if not self.tokenizer.is_fast:
+            logger.warning("No Rust-backed fast tokenizer is available for %s, tokenization is slow.", model_name)
+        self.backend = os.environ.get("MODEL_BACKEND", "torch").lower()
+        self.device = "cuda" if self.backend in ("torch", "tensorrt") and torch.cuda.is_available() else "cpu"
+        quantization = os.environ.get("MODEL_QUANT", "int8").lower()
+
+        if self.backend == "onnx":
+            # Serve an exported ONNX graph through ONNX Runtime
+            self.quantization = self._load_onnx_model(quantization)
+        elif self.backend == "tensorrt":
+            # Serve a compiled TensorRT engine on the GPU
+            self.quantization = self._load_tensorrt_model()
+        else:
+            self._load_torch_model()
+            self.model.eval()  # Set to evaluation mode
+
+            # Reduce model precision as requested by MODEL_QUANT (int8, bf16 or fp32), or to FP16 on the GPU
+            self.quantization = self._optimize_model(quantization)
+
+        # Keep the model config around, the service reads the class labels from it
+        self.config = self.model.config
+
+        # Trace and freeze the model per sequence length bucket to drop eager-mode dispatch overhead
+        self._traced: Dict[int, torch.jit.ScriptModule] = {}
+        self.torchscript = self.backend == "torch" and os.environ.get("MODEL_TORCHSCRIPT", "0") == "1"
+        if self.torchscript:
+            self._trace_model()
+
+        logger.info(
+            "ModerationModel loaded: %s (backend: %s, device: %s, quantization: %s, torchscript: %s)",
+            model_name,
+            self.backend,
+            self.device,
+            self.quantization,
+            self.torchscript,
+        )
+
+    def share_memory(self) -> None:
+        """Move the model weights to shared memory so processes forked afterwards reuse them."""
+        if isinstance(self.model, torch.nn.Module):
+            self.model.share_memory()
+            logger.info("Moved weights of %s to shared memory", self.model_name)
+
+    def _load_torch_model(self) -> None:
+        """Load the PyTorch model, using FlashAttention on the GPU when it is installed."""
+        # FlashAttention needs half precision weights, so on the GPU the model is loaded in FP16 right away
+        kwargs: Dict[str, Any] = {"torch_dtype": torch.float16} if self.device == "cuda" else {}
+
+        # Without an explicit choice transformers picks the best attention kernel the model supports
+        attn_implementation = os.environ.get("MODEL_ATTN_IMPLEMENTATION")
+        if attn_implementation:
+            kwargs["attn_implementation"] = attn_implementation
+        elif self.device == "cuda" and importlib.util.find_spec("flash_attn") is not None:
+            try:
+                self.model = AutoModelForSequenceClassification.from_pretrained(
+                    self.model_name, attn_implementation="flash_attention_2", **kwargs
+                )
+                return
+            except (ValueError, ImportError) as exc:
+                # Not every architecture supports FlashAttention
+                logger.info("FlashAttention is not available for %s (%s).", self.model_name, exc)
+
+        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name, **kwargs)
+
+    def _optimize_model(self, quantization: str) -> str:
+        """Convert the model to the requested precision.
+
+        Args:
+            quantization: The requested precision: "int8", "bf16" or "fp32".
+
+        Returns:
+            str: The precision the model actually runs in.
+        """
+        if self.device == "cuda":
+            # The INT8 and BF16 paths target CPU kernels, on the GPU the model runs on FP16 tensor cores
+            self.model = self.model.to(self.device).half()
+            return "fp16"
+
+        if quantization == "int8":
+            # Store Linear weights as INT8 and dispatch matmuls to FBGEMM/oneDNN INT8 kernels
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            return "int8"
+
+        if quantization == "bf16":
+            if not torch.cpu._is_avx512_bf16_supported():  # noqa: SLF001
+                logger.warning("CPU does not support AVX512-BF16, falling back to FP32 inference.")
+                return "fp32"
+            self._optimize_with_ipex()
+            return "bf16"
+
+        return "fp32"
+
+    def _optimize_with_ipex(self) -> None:
+        """Optimize the model for BF16 with intel_extension_for_pytorch, if a matching version is installed."""
+        try:
+            ipex_version = importlib.metadata.version("intel-extension-for-pytorch")
+        except importlib.metadata.PackageNotFoundError:
+            logger.info("intel_extension_for_pytorch is not installed, using plain BF16 autocast.")
+            return
+
+        # IPEX exits the process on import when it was built for another torch minor version
+        if ipex_version.split(".")[:2] != torch.__version__.split(".")[:2]:
+            logger.warning(
+                "intel_extension_for_pytorch %s does not match torch %s, using plain BF16 autocast.",
+                ipex_version,
+                torch.__version__,
+            )
+            return
+
+        import intel_extension_for_pytorch as ipex
+
+        self.model = ipex.optimize(self.model, dtype=torch.bfloat16, inplace=True)
+
+    def _load_onnx_model(self, quantization: str) -> str:
+        """Load the model as an ONNX Runtime session, exporting and quantizing it on first use.
+
+        Exported graphs are cached under CACHE_DIR so they are built only once per machine. Each graph is
+        written to a private directory and moved into the cache when complete, so concurrent workers never
+        load a partially written graph.
+
+        Args:
+            quantization: The requested precision: "int8" or "fp32".
+
+        Returns:
+            str: The precision the model actually runs in.
+
+        Raises:
+            RuntimeError: If the optional ONNX Runtime dependencies are not installed.
+        """
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        except ImportError as exc:
+            raise RuntimeError("MODEL_BACKEND=onnx requires the 'onnx' extra to be installed.") from exc
+
+        fp32_dir = self._cache_dir() / "onnx"
+        if not (fp32_dir / "model.onnx").exists():
+            logger.info("Exporting %s to ONNX in %s", self.model_name, fp32_dir)
+            exported = ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+            with _build_directory(fp32_dir) as build_dir:
+                exported.save_pretrained(build_dir)
+
+        if quantization != "int8":
+            self.model = ORTModelForSequenceClassification.from_pretrained(fp32_dir, provider="CPUExecutionProvider")
+            return "fp32"
+
+        int8_dir = self._cache_dir() / "onnx-int8"
+        if not (int8_dir / "model_quantized.onnx").exists():
+            logger.info("Quantizing ONNX model to INT8 in %s", int8_dir)
+            quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+            with _build_directory(int8_dir) as build_dir:
+                quantizer.quantize(
+                    save_dir=build_dir,
+                    quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False),
+                )
+
+        self.model = ORTModelForSequenceClassification.from_pretrained(
+            int8_dir, file_name="model_quantized.onnx", provider="CPUExecutionProvider"
+        )
+        return "int8"
+
+    def _load_tensorrt_model(self) -> str:
+        """Load the model as a TensorRT engine, building it on first use.
+
+        The engine is cached under CACHE_DIR so it is built only once per machine.
+
+        Returns:
+            str: The precision the model actually runs in.
+
+        Raises:
+            RuntimeError: If no CUDA GPU is available or TensorRT is not installed.
+        """
+        if self.device != "cuda":
+            raise RuntimeError("MODEL_BACKEND=tensorrt requires a CUDA GPU.")
+        try:
+            from classifier_demo.services._trt_backend import TensorRTModel
+        except ImportError as exc:
+            raise RuntimeError("MODEL_BACKEND=tensorrt requires the 'tensorrt' extra to be installed.") from exc
+
+        self.model = TensorRTModel(self.model_name, self._cache_dir() / "tensorrt")
+        return "fp16"
+
+    def _cache_dir(self) -> Path:
+        """Return the directory where artifacts exported from the model are cached."""
+        return CACHE_DIR / self.model_name.replace("/", "--")
+
+    def _trace_model(self) -> None:
+        """Trace and freeze the model once for every sequence length bucket."""
+        # Traced graphs return tuples instead of ModelOutput objects
+        self.config.return_dict = False
+
+        # The trace sanity check re-runs and compares the traced graph, which the casts inserted by autocast
+        # make fail even though the trace is correct
+        check_trace = self.device != "cuda" and self.quantization != "bf16"
+
+        example = dict(self.tokenizer(["warmup"], return_tensors="pt"))
+        with torch.no_grad(), self._autocast():
+            for length in self.SEQUENCE_BUCKETS:
+                inputs = self._to_device(self._pad_to_length(example, length))
+                example_inputs = (inputs["input_ids"], inputs["attention_mask"])
+                traced = torch.jit.trace(self.model, example_inputs, strict=False, check_trace=check_trace)
+                traced = torch.jit.freeze(traced.eval())
+
+                # Run a couple of passes so the JIT profiles the graph and selects its fused kernels
+                for _ in range(2):
+                    traced(*example_inputs)
+                self._traced[length] = traced
+
+    def _autocast(self) -> torch.autocast:
+        """Return the autocast context matching the model precision."""
+        if self.device == "cuda":
+            return torch.autocast("cuda", dtype=torch.float16)
+        return torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.quantization == "bf16")
+
+    def tokenize(self, texts: List[str]) -> Dict[str, torch.Tensor]:
+        """Tokenize a batch of texts into model inputs.
+
+        Args:
+            texts: The texts to tokenize.
+
+        Returns:
+            Dict[str, torch.Tensor]: The model inputs for the batch.
+        """
+        # Pad to the longest text in the batch
+        inputs = dict(
+            self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=self.MAX_LENGTH)
+        )
+
+        if self.torchscript:
+            # Traced graphs are specialized to a sequence length, so pad up to the nearest traced one
+            length = inputs["input_ids"].shape[1]
+            inputs = self._pad_to_length(inputs, next(bucket for bucket in self.SEQUENCE_BUCKETS if bucket >= length))
+
+        return self._to_device(inputs)
+
+    def _pad_to_length(self, inputs: Dict[str, torch.Tensor], length: int) -> Dict[str, torch.Tensor]:
+        """Pad tokenized inputs along the sequence axis to the given length.
+
+        Args:
+            inputs: The model inputs for the batch.
+            length: The sequence length to pad to.
+
+        Returns:
+            Dict[str, torch.Tensor]: The padded model inputs.
+        """
+        padding = length - inputs["input_ids"].shape[1]
+        if padding <= 0:
+            return inputs
+
+        # Token ids are padded with the pad token, attention masks and token type ids with zeros
+        pad = (padding, 0) if self.tokenizer.padding_side == "left" else (0, padding)
+        pad_values = {"input_ids": self.tokenizer.pad_token_id}
+        return {
+            name: torch.nn.functional.pad(tensor, pad, value=pad_values.get(name, 0)) for name, tensor in inputs.items()
+        }
+
+    def _to_device(self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Move model inputs to the device the model runs on.
+
+        Args:
+            inputs: The model inputs for the batch.
+
+        Returns:
+            Dict[str, torch.Tensor]: The model inputs on the model device.
+        """
+        if self.device == "cuda":
+            # Copy from pinned host memory so the transfer to the GPU does not block
+            return {name: tensor.pin_memory().to(self.device, non_blocking=True) for name, tensor in inputs.items()}
+        return inputs
+
+    def forward(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Run the model on tokenized inputs and turn its logits into confidence scores.
+
+        Args:
+            inputs: The model inputs for the batch.
+
+        Returns:
+            torch.Tensor: The confidence scores of shape [batch_size, num_labels].
+        """
+        # Inference mode also skips the version counter and view tracking that no_grad still does
+        with torch.inference_mode(), self._autocast():
+            if self.backend == "tensorrt":
+                logits = self.model(inputs["input_ids"], inputs["attention_mask"])
+            elif self.torchscript:
+                traced = self._traced[inputs["input_ids"].shape[1]]
+                logits = traced(inputs["input_ids"], inputs["attention_mask"])[0]
+            else:
+                logits = self.model(**inputs).logits
+
+            # The logits are a fresh output of this forward pass, so the sigmoid can run in place
+            return logits.float().sigmoid_()
@@ -0,0 +1,132 @@
+"""Unsafe Text Prefilter.
+
+This module recognizes short texts that are trivially safe, so the moderation service can
+answer them without running the transformer model. By default only greetings and identifiers
+qualify; custom unsafe patterns can widen that to any short text they do not match. Patterns
+are compiled with Hyperscan when it is installed and with the standard re module otherwise.
+"""
+
+import logging
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class UnsafeTextPrefilter:
+    """Fast pattern check that lets trivially safe texts skip the moderation model.
+
+    A text counts as trivially safe when it is shorter than ``max_text_length``, matches one of
+    the safe patterns from start to end (if any are given) and matches none of the unsafe
+    patterns. Patterns are matched case-insensitively. No list of unsafe patterns can cover
+    every slur, so the defaults also require a safe pattern: without one, any unsafe text the
+    unsafe patterns miss is reported as safe.
+    """
+
+    # Stems of words that make a text worth sending to the model
+    DEFAULT_PATTERNS: Tuple[str, ...] = (
+        r"\b(kill|murder|stab|shoot|slaughter|behead|massacre|bomb|terror|assault|attack|strangl|chok|tortur)",
+        r"\b(die|dead|death|blood|gore|hurt|harm|suicid|weapon|gun|knife)",
+        r"\b(hat(e|ing|red)|racis|nazi|supremac|inferior|subhuman|vermin|slur)",
+        r"\b(rap(e|ist)|molest|grop|harass|stalk)",
+        r"\b(sex|porn|nud(e|ity)|naked|nsfw|horny|fuck|dick|cock|puss|boob|tit|cum|orgasm|erotic|fetish)",
+        r"\b(idiot|stupid|moron|bitch|whore|slut|bastard|retard)",
+    )
+
+    # Whole texts that are safe without running the model: greetings, acknowledgements and identifiers
+    DEFAULT_SAFE_PATTERNS: Tuple[str, ...] = (
+        r"(hi|hello|hey|good (morning|afternoon|evening))[ !.,]*(how are you( doing)?( today)?)?[ !.?]*",
+        r"(thanks|thank you|ok|okay|yes|no|bye|goodbye)[ !.]*",
+        r"([a-z]+[-_#: ]?)?[0-9][0-9-]*",
+        r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}",
+    )
+
+    def __init__(
+        self,
+        patterns: Sequence[str] = DEFAULT_PATTERNS,
+        safe_patterns: Optional[Sequence[str]] = DEFAULT_SAFE_PATTERNS,
+        max_text_length: int = 128,
+    ) -> None:
+        """Compile the patterns once.
+
+        Args:
+            patterns: Regular expressions of unsafe content.
+            safe_patterns: Regular expressions of whole texts that may skip the model, or None to let any
+                short text that matches no unsafe pattern skip it.
+            max_text_length: Texts of this length or longer are always sent to the model.
+        """
+        self.max_text_length = max_text_length
+        # Safe patterns have to match the whole text
+        anchored = None if safe_patterns is None else [f"^(?:{pattern})$" for pattern in safe_patterns]
+        try:
+            import hyperscan
+        except ImportError:
+            self.engine = "re"
+            self._matches = self._compile_re(patterns)
+            self._matches_safe = None if anchored is None else self._compile_re(anchored)
+        else:
+            self.engine = "hyperscan"
+            self._matches = self._compile_hyperscan(hyperscan, patterns)
+            self._matches_safe = None if anchored is None else self._compile_hyperscan(hyperscan, anchored)
+        logger.info("UnsafeTextPrefilter compiled %d patterns with %s", len(patterns), self.engine)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "UnsafeTextPrefilter":
+        """Create a prefilter from a file with one unsafe regular expression per line.
+
+        Any short text that matches none of the patterns is trivially safe, so the patterns must cover
+        every kind of unsafe content the model would flag.
+
+        Args:
+            path: The path of the patterns file.
+
+        Returns:
+            UnsafeTextPrefilter: The prefilter for the patterns in the file.
+        """
+        with path.open(encoding="utf-8") as patterns_file:
+            return cls([line.strip() for line in patterns_file if line.strip()], safe_patterns=None)
+
+    def is_trivially_safe(self, text: str) -> bool:
+        """Check whether a text can be reported as safe without running the model.
+
+        Args:
+            text: The text to check.
+
+        Returns:
+            bool: True if the text is short, matches a safe pattern and matches no unsafe pattern.
+        """
+        if len(text) >= self.max_text_length:
+            return False
+        if self._matches_safe is not None and not self._matches_safe(text):
+            return False
+        return not self._matches(text)
+
+    @staticmethod
+    def _compile_re(patterns: Sequence[str]) -> Callable[[str], bool]:
+        """Compile the patterns into a single regular expression."""
+        regex = re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+        return lambda text: regex.search(text) is not None
+
+    @staticmethod
+    def _compile_hyperscan(hyperscan, patterns: Sequence[str]) -> Callable[[str], bool]:
+        """Compile the patterns into a Hyperscan database."""
+        database = hyperscan.Database()
+        flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+        database.compile(
+            expressions=[pattern.encode() for pattern in patterns],
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            flags=[flags] * len(patterns),
+        )
+        # The database owns a single scratch space, which concurrent scans must not share
+        lock = Lock()
+
+        def matches(text: str) -> bool:
+            found = []
+            with lock:
+                database.scan(text.encode(), match_event_handler=lambda *_: found.append(True))
+            return bool(found)
+
+        return matches
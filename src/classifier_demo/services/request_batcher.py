@@ -0,0 +1,118 @@
+"""Request Batcher.
+
+This module provides dynamic request batching for the content moderation service.
+Concurrent requests are collected into a queue and a single worker coroutine runs
+them through the model together, so the cost of a forward pass is shared by the batch.
+"""
+
+import asyncio
+import contextlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from classifier_demo.services.content_moderation_service import ContentModerationService
+
+logger = logging.getLogger(__name__)
+
+
+class RequestBatcher:
+    """Collects moderation requests and scores them in batches.
+
+    A single background worker pulls up to ``max_batch_size`` pending requests, waiting at
+    most ``batch_wait_timeout_s`` for the batch to fill up, and hands them to the service in
+    one call. Results are routed back to each caller through its own future.
+    """
+
+    def __init__(
+        self,
+        service: ContentModerationService,
+        max_batch_size: int = 32,
+        batch_wait_timeout_s: float = 0.005,
+    ) -> None:
+        """Initialize the request batcher.
+
+        Args:
+            service: The content moderation service used to score batches.
+            max_batch_size: The maximum number of texts scored in a single forward pass.
+            batch_wait_timeout_s: How long to wait for more requests once the first one arrives.
+        """
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.batch_wait_timeout_s = batch_wait_timeout_s
+        self._queue: asyncio.Queue[Tuple[str, asyncio.Future]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background worker on the running event loop."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info(
+                "RequestBatcher started with max batch size: %d, wait timeout: %.3fs",
+                self.max_batch_size,
+                self.batch_wait_timeout_s,
+            )
+
+    async def stop(self) -> None:
+        """Stop the background worker."""
+        if self._worker is not None:
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+            logger.info("RequestBatcher stopped.")
+
+    async def submit(self, text: str) -> Dict[str, float]:
+        """Enqueue a text for moderation and wait for its scores.
+
+        Args:
+            text: The text to be moderated.
+
+        Returns:
+            Dict[str, float]: A dictionary mapping category names to their confidence scores.
+        """
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the next request and gather any others that arrive within the timeout."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait_timeout_s
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        """Score queued requests batch by batch until cancelled."""
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for text, _ in batch]
+
+            try:
+                # Run the model off the event loop so new requests keep being accepted
+                results = await asyncio.to_thread(self.service.moderate_batch, texts)
+            except Exception as exc:
+                logger.exception("Failed to moderate batch of %d texts", len(texts))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            for (_, future), scores in zip(batch, results):
+                if not future.done():
+                    future.set_result(scores)
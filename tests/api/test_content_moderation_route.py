@@ -11,7 +11,8 @@ from classifier_demo.services.content_moderation_service import ContentModeratio
 def client():
     """Fixture to provide a test client."""
     app = create_app()
-    return TestClient(app)
+    with TestClient(app) as client:
+        yield client
 
 
 @pytest.fixture
@@ -15,12 +15,13 @@ def moderation_service():
     service.cleanup()
 
 
-def test_singleton_pattern():
-    """Test that ContentModerationService follows singleton pattern."""
+def test_model_is_loaded_once():
+    """Test that ContentModerationService instances share a single loaded model."""
     service1 = ContentModerationService.initialize()
     service2 = ContentModerationService.initialize()
-    assert service1 is service2
+    assert service1.model is service2.model
     service1.cleanup()
+    service2.cleanup()
 
 
 def test_moderate_text(moderation_service):
@@ -54,14 +55,14 @@ def test_request_rate_tracking(moderation_service):
 
 def test_cleanup():
     """Test cleanup functionality."""
-    # Create a new instance
+    # Create a new instance and fill its score cache
     service = ContentModerationService.initialize()
-    assert service._initialized is True
+    service.moderate_text("Test message")
+    assert service._score_cache
 
     # Cleanup
     service.cleanup()
-    assert service._initialized is False
-    assert service._instance is None
+    assert not service._score_cache
 
 
 def test_category_mapping(moderation_service):
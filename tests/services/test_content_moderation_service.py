@@ -1,3 +1,6 @@
+import os
+import subprocess
+import sys
 import time
 
 import pytest
@@ -6,6 +9,27 @@ from classifier_demo.services.content_moderation_service import (
     ContentModerationService,
 )
 
+# Loads the model like the gunicorn master does, then checks that a forked worker can use several threads
+FORKED_WORKER_SCRIPT = """
+import os
+
+import torch
+
+from classifier_demo.services.content_moderation_service import ContentModerationService, preload_model
+
+model = preload_model()
+model.forward(model.tokenize(["Warm up the master process"]))
+
+pid = os.fork()
+if pid == 0:
+    torch.set_num_threads(2)
+    result = ContentModerationService().moderate_text("Hello, how are you today?")
+    os._exit(0 if result["Safe Content"] > 0.5 else 1)
+
+_, status = os.waitpid(pid, 0)
+raise SystemExit(os.waitstatus_to_exitcode(status))
+"""
+
 
 @pytest.fixture
 def moderation_service():
@@ -15,12 +39,13 @@ def moderation_service():
     service.cleanup()
 
 
-def test_singleton_pattern():
-    """Test that ContentModerationService follows singleton pattern."""
+def test_model_is_loaded_once():
+    """Test that ContentModerationService instances share a single loaded model."""
     service1 = ContentModerationService.initialize()
     service2 = ContentModerationService.initialize()
-    assert service1 is service2
+    assert service1.model is service2.model
     service1.cleanup()
+    service2.cleanup()
 
 
 def test_moderate_text(moderation_service):
@@ -54,14 +79,14 @@ def test_request_rate_tracking(moderation_service):
 
 def test_cleanup():
     """Test cleanup functionality."""
-    # Create a new instance
+    # Create a new instance and fill its score cache
     service = ContentModerationService.initialize()
-    assert service._initialized is True
+    service.moderate_text("Test message")
+    assert service._score_cache
 
     # Cleanup
     service.cleanup()
-    assert service._initialized is False
-    assert service._instance is None
+    assert not service._score_cache
 
 
 def test_category_mapping(moderation_service):
@@ -74,3 +99,38 @@ def test_category_mapping(moderation_service):
         assert category in result
         assert isinstance(result[category], float)
         assert 0 <= result[category] <= 1
+
+
+def test_repeated_text_is_served_from_cache(moderation_service, mocker):
+    """Test that scores for a repeated text are cached and returned as a fresh dictionary."""
+    first = moderation_service.moderate_text("Have a nice day")
+
+    forward = mocker.spy(moderation_service.model, "forward")
+    second = moderation_service.moderate_text("  Have a nice day  ")
+
+    assert forward.call_count == 0
+    assert second == first
+    assert second is not first
+
+
+def test_prefilter_skips_model_for_trivially_safe_text(monkeypatch, mocker):
+    """Test that the prefilter reports trivially safe texts as safe without running or caching the model."""
+    monkeypatch.setenv("MODERATION_PREFILTER", "1")
+    service = ContentModerationService.initialize()
+
+    forward = mocker.spy(service.model, "forward")
+    result = service.moderate_text("Hello, how are you today?")
+
+    assert forward.call_count == 0
+    assert result["Safe Content"] == 1.0
+    assert not service._score_cache
+    service.cleanup()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_forked_worker_can_moderate_after_preload():
+    """Test that a worker forked after preload_model runs a multi-threaded forward pass without hanging."""
+    # Run in a fresh interpreter, since this process may already have started a torch thread pool
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, "-c", FORKED_WORKER_SCRIPT], env=env, timeout=600, check=False)
+    assert result.returncode == 0
@@ -0,0 +1,114 @@
+import pytest
+import torch
+from transformers import (
+    BertConfig,
+    BertForSequenceClassification,
+    BertTokenizerFast,
+    DebertaV2Config,
+    DebertaV2ForSequenceClassification,
+)
+
+from classifier_demo.services import content_moderation_service
+from classifier_demo.services.content_moderation_service import ContentModerationService
+from classifier_demo.services.moderation_model import ModerationModel
+
+LABELS = ["H", "H2", "HR", "OK", "S", "S3", "SH", "V", "V2"]
+WORDS = ["hello", "how", "are", "you", "today", "have", "a", "nice", "day", "i", "hate", "and", "want", "to", "hurt"]
+VOCABULARY = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *WORDS]
+TEXTS = ["hello", "have a nice day", "i hate you and want to hurt you today " * 8]
+
+
+@pytest.fixture(scope="module", params=["bert", "deberta-v2"])
+def tiny_model_path(request, tmp_path_factory):
+    """Save a small randomly initialized checkpoint with the moderation labels, so tests run offline."""
+    path = tmp_path_factory.mktemp(request.param)
+    (path / "vocab.txt").write_text("\n".join(VOCABULARY) + "\n")
+    BertTokenizerFast(vocab_file=str(path / "vocab.txt")).save_pretrained(path)
+
+    config = {
+        "vocab_size": len(VOCABULARY),
+        "hidden_size": 32,
+        "num_hidden_layers": 2,
+        "num_attention_heads": 2,
+        "intermediate_size": 64,
+        "initializer_range": 0.2,
+        "id2label": dict(enumerate(LABELS)),
+        "label2id": {label: i for i, label in enumerate(LABELS)},
+    }
+    torch.manual_seed(0)
+    if request.param == "bert":
+        model = BertForSequenceClassification(BertConfig(**config))
+    else:
+        model = DebertaV2ForSequenceClassification(DebertaV2Config(**config))
+    model.save_pretrained(path)
+    return str(path)
+
+
+def load_model(monkeypatch, model_path, quantization, torchscript):
+    """Load the model on the CPU with the given precision, with or without TorchScript."""
+    configure_model(monkeypatch, quantization, torchscript)
+    return ModerationModel(model_path)
+
+
+def configure_model(monkeypatch, quantization, torchscript):
+    """Select a CPU model with the given precision, with or without TorchScript."""
+    monkeypatch.setenv("MODEL_BACKEND", "torch")
+    monkeypatch.setenv("MODEL_QUANT", quantization)
+    monkeypatch.setenv("MODEL_TORCHSCRIPT", "1" if torchscript else "0")
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    # BF16 autocast runs on any CPU, only slower without AVX512-BF16
+    monkeypatch.setattr(torch.cpu, "_is_avx512_bf16_supported", lambda: True)
+
+
+@pytest.mark.parametrize("quantization", ["fp32", "int8", "bf16"])
+def test_torchscript_model_matches_eager_model(monkeypatch, tiny_model_path, quantization):
+    """Test that the model traces for every precision and scores like the eager model."""
+    eager = load_model(monkeypatch, tiny_model_path, quantization, torchscript=False)
+    traced = load_model(monkeypatch, tiny_model_path, quantization, torchscript=True)
+
+    assert traced.quantization == quantization
+    assert sorted(traced._traced) == list(ModerationModel.SEQUENCE_BUCKETS)
+    torch.testing.assert_close(
+        traced.forward(traced.tokenize(TEXTS)), eager.forward(eager.tokenize(TEXTS)), atol=2e-2, rtol=0
+    )
+
+
+def test_torchscript_inputs_are_padded_to_sequence_buckets(monkeypatch, tiny_model_path):
+    """Test that batches are padded up to the nearest sequence length the model was traced for."""
+    model = load_model(monkeypatch, tiny_model_path, "fp32", torchscript=True)
+
+    for texts, width in ((TEXTS[:1], 32), (TEXTS[:2], 32), (TEXTS, 128)):
+        inputs = model.tokenize(texts)
+        assert inputs["input_ids"].shape[1] == width
+        assert inputs["attention_mask"].shape[1] == width
+
+
+def test_torchscript_inputs_keep_left_padding(monkeypatch, tiny_model_path):
+    """Test that inputs of a left-padded tokenizer are padded to the bucket on the left."""
+    model = load_model(monkeypatch, tiny_model_path, "fp32", torchscript=True)
+    model.tokenizer.padding_side = "left"
+
+    inputs = model.tokenize(TEXTS[:2])
+
+    assert inputs["input_ids"].shape[1] in ModerationModel.SEQUENCE_BUCKETS
+    assert (inputs["input_ids"][:, 0] == model.tokenizer.pad_token_id).all()
+    assert not inputs["attention_mask"][:, 0].any()
+    assert inputs["attention_mask"][:, -1].all()
+
+
+def test_torchscript_service_scores_match_eager_model(monkeypatch, tiny_model_path):
+    """Test that the service scores a batch of mixed lengths through the traced model like the eager model."""
+    eager = load_model(monkeypatch, tiny_model_path, "fp32", torchscript=False)
+    expected = eager.forward(eager.tokenize(TEXTS))
+
+    configure_model(monkeypatch, "fp32", torchscript=True)
+    content_moderation_service._load_model.cache_clear()
+    service = ContentModerationService(tiny_model_path)
+    try:
+        assert service.model.torchscript
+        results = service.moderate_batch(TEXTS)
+    finally:
+        service.cleanup()
+        content_moderation_service._load_model.cache_clear()
+
+    torch.testing.assert_close(torch.tensor([list(result.values()) for result in results]), expected)
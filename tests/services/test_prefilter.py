@@ -0,0 +1,66 @@
+import importlib.util
+import sys
+
+import pytest
+
+from classifier_demo.services.prefilter import UnsafeTextPrefilter
+
+
+@pytest.fixture(
+    params=[
+        "re",
+        pytest.param(
+            "hyperscan",
+            marks=pytest.mark.skipif(importlib.util.find_spec("hyperscan") is None, reason="requires hyperscan"),
+        ),
+    ]
+)
+def engine(request, monkeypatch):
+    """Fixture to compile patterns with the standard re module and, if installed, with Hyperscan."""
+    if request.param == "re":
+        # A None entry in sys.modules makes the import of hyperscan fail
+        monkeypatch.setitem(sys.modules, "hyperscan", None)
+    return request.param
+
+
+@pytest.fixture
+def prefilter(engine):
+    """Fixture to provide an UnsafeTextPrefilter with the default patterns."""
+    prefilter = UnsafeTextPrefilter()
+    assert prefilter.engine == engine
+    return prefilter
+
+
+def test_short_safe_text_is_trivially_safe(prefilter):
+    """Test that short greetings and identifiers skip the model."""
+    assert prefilter.is_trivially_safe("Hello, how are you today?")
+    assert prefilter.is_trivially_safe("order-12345")
+
+
+def test_unsafe_patterns_are_not_trivially_safe(prefilter):
+    """Test that texts matching unsafe patterns, in any case, are sent to the model."""
+    assert not prefilter.is_trivially_safe("I hate you and want to hurt you")
+    assert not prefilter.is_trivially_safe("I will KILL them")
+
+
+def test_hate_speech_without_unsafe_patterns_is_not_trivially_safe(prefilter):
+    """Test that hate speech the unsafe patterns miss is still sent to the model."""
+    assert not prefilter.is_trivially_safe("People like you should go back where you came from")
+    assert not prefilter.is_trivially_safe("hello, you people are animals")
+
+
+def test_long_text_is_not_trivially_safe(prefilter):
+    """Test that long texts are always sent to the model."""
+    assert not prefilter.is_trivially_safe("Have a nice day. " * 10)
+
+
+def test_patterns_from_file(engine, tmp_path):
+    """Test that custom patterns are loaded from a file and let any other short text skip the model."""
+    patterns_file = tmp_path / "patterns.txt"
+    patterns_file.write_text("\\bspam\\b\n\n\\bscam\\b\n")
+
+    prefilter = UnsafeTextPrefilter.from_file(patterns_file)
+
+    assert prefilter.engine == engine
+    assert not prefilter.is_trivially_safe("this is a scam")
+    assert prefilter.is_trivially_safe("I hate mondays")
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from classifier_demo.services.request_batcher import RequestBatcher
+
+
+class FakeModerationService:
+    """Stand-in for ContentModerationService that records the batches it receives."""
+
+    def __init__(self):
+        self.batches = []
+
+    def moderate_batch(self, texts):
+        self.batches.append(list(texts))
+        if "boom" in texts:
+            raise RuntimeError("model failure")
+        return [{"Safe Content": float(len(text))} for text in texts]
+
+
+async def _submit_all(batcher, texts):
+    batcher.start()
+    try:
+        return await asyncio.gather(*(batcher.submit(text) for text in texts))
+    finally:
+        await batcher.stop()
+
+
+def test_concurrent_requests_are_batched():
+    """Test that concurrent requests are scored together and routed back in order."""
+    service = FakeModerationService()
+    batcher = RequestBatcher(service, max_batch_size=8, batch_wait_timeout_s=0.05)
+
+    results = asyncio.run(_submit_all(batcher, ["a", "bb", "ccc"]))
+
+    assert service.batches == [["a", "bb", "ccc"]]
+    assert results == [{"Safe Content": 1.0}, {"Safe Content": 2.0}, {"Safe Content": 3.0}]
+
+
+def test_batch_size_is_limited():
+    """Test that no batch exceeds the configured maximum size."""
+    service = FakeModerationService()
+    batcher = RequestBatcher(service, max_batch_size=2, batch_wait_timeout_s=0.05)
+
+    results = asyncio.run(_submit_all(batcher, ["a", "b", "c", "d", "e"]))
+
+    assert len(results) == 5
+    assert all(len(batch) <= 2 for batch in service.batches)
+    assert sum(len(batch) for batch in service.batches) == 5
+
+
+def test_batch_failure_is_propagated():
+    """Test that a failing batch raises the error for each of its requests."""
+    service = FakeModerationService()
+    batcher = RequestBatcher(service, max_batch_size=8, batch_wait_timeout_s=0.05)
+
+    with pytest.raises(RuntimeError, match="model failure"):
+        asyncio.run(_submit_all(batcher, ["ok", "boom"]))